@@ -1,4 +1,4 @@
-from streamlit_desktop_app.core import run_streamlit, start_desktop_app
+from streamlit_desktop_app.core import freeze_support, run_streamlit, start_desktop_app
 from streamlit_desktop_app._version import __version__
 
-__all__ = ["run_streamlit", "start_desktop_app", "__version__"]
+__all__ = ["freeze_support", "run_streamlit", "start_desktop_app", "__version__"]
@@ -1,4 +1,4 @@
-from streamlit_desktop_app.core import start_desktop_app
+from streamlit_desktop_app.core import freeze_support, start_desktop_app
 import os
 
 
@@ -11,4 +11,5 @@ def main():
 
 
 if __name__ == "__main__":
+    freeze_support()
     main()
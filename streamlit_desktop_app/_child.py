@@ -0,0 +1,52 @@
+"""Entry point of the Streamlit process launched by start_desktop_app.
+
+This module must stay free of pywebview and other desktop-side imports, so
+that the Streamlit process only loads what it needs.
+"""
+import os
+import sys
+from typing import Sequence
+
+from streamlit_desktop_app.core import READY_FD_ENV
+
+
+def run_streamlit_cli(argv: Sequence[str]) -> None:
+    """Run the Streamlit CLI in the current process.
+
+    Args:
+        argv: Streamlit command line, e.g. ("streamlit", "run", "app.py").
+    """
+    from streamlit.web import cli as stcli
+
+    ready_fd = os.environ.pop(READY_FD_ENV, None)
+    if ready_fd is not None:
+        notify_when_ready(int(ready_fd))
+    sys.argv = list(argv)
+    stcli.main()
+
+
+def notify_when_ready(fd: int) -> None:
+    """Write the server port to a pipe once Streamlit starts listening.
+
+    Args:
+        fd: Write end of the pipe. It is closed after the port is written.
+    """
+    from streamlit import config
+    from streamlit.web import bootstrap
+
+    on_server_start = getattr(bootstrap, "_on_server_start", None)
+    if on_server_start is None:
+        # Unknown Streamlit internals; the parent falls back to the server URL
+        os.close(fd)
+        return
+
+    def _on_server_start(server) -> None:
+        on_server_start(server)
+        os.write(fd, f"{config.get_option('server.port')}\n".encode())
+        os.close(fd)
+
+    bootstrap._on_server_start = _on_server_start
+
+
+if __name__ == "__main__":
+    run_streamlit_cli(sys.argv[1:])
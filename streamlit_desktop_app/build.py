@@ -113,7 +113,7 @@ def build_executable(
 import os
 import sys
 
-from streamlit_desktop_app import start_desktop_app
+from streamlit_desktop_app import freeze_support, start_desktop_app
 import streamlit_desktop_app
 
 
@@ -133,6 +133,7 @@ if __name__ == "__main__":
     if '_PYI_SPLASH_IPC' in os.environ:
         import pyi_splash
         pyi_splash.close()
+    freeze_support()
     start_desktop_app(get_script_path(), title="{name}", options={parse_streamlit_options(streamlit_options)})
 """
         wrapper.write(wrapper_content.encode())
@@ -64,17 +64,25 @@ def add_build_parser(subparsers: argparse._SubParsersAction):
     build_parser.set_defaults(func=build_command)
 
 
-def main():
+def _build_parser() -> argparse.ArgumentParser:
+    """Create the top-level parser with all subcommands."""
     parser = argparse.ArgumentParser(
         description="Streamlit Desktop App CLI"
     )
     subparsers = parser.add_subparsers(dest="command", required=True)
 
     add_build_parser(subparsers)
+    return parser
+
 
-    args = parser.parse_args()
+def _dispatch(args: argparse.Namespace):
+    """Run the handler of the parsed subcommand."""
     args.func(args)
 
 
+def main():
+    _dispatch(_build_parser().parse_args())
+
+
 if __name__ == "__main__":
     main()
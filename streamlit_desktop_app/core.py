@@ -1,53 +1,224 @@
+import importlib.metadata
 import logging
-import multiprocessing
-import requests
+import os
+import re
+import select
 import socket
+import subprocess
 import sys
+import threading
 import time
-from typing import Optional, Dict
+from typing import IO, Callable, Optional, Dict, Sequence
 
-import webview
-from streamlit.web import cli as stcli
+
+# Streamlit options that a desktop app does not need. Users may override them.
+DEFAULT_OPTIONS = {
+    "server.fileWatcherType": "none",
+    "server.runOnSave": "false",
+    "browser.gatherUsageStats": "false",
+}
+
+# Streamlit options controlled by start_desktop_app. User values are ignored.
+OVERRIDDEN_OPTIONS = frozenset(
+    {
+        "server.address",
+        "server.port",
+        "server.headless",
+        "global.developmentMode",
+        "logger.hideWelcomeMessage",
+        "browser.serverAddress",
+        "browser.serverPort",
+    }
+)
+
+# Options left unset so that Streamlit prints the URL ServerWatcher looks for.
+URL_OPTIONS = ("logger.hideWelcomeMessage", "browser.serverAddress", "browser.serverPort")
+
+# Set in the environment of a frozen executable re-launched to run Streamlit.
+CHILD_PROCESS_ENV = "STREAMLIT_DESKTOP_APP_CHILD"
+
+# Descriptor of the pipe on which the Streamlit process reports its port.
+READY_FD_ENV = "STREAMLIT_DESKTOP_APP_READY_FD"
+
+# Printed by Streamlit once the server is listening.
+SERVER_URL_PATTERN = re.compile(r"URL:\s+http://localhost:(\d+)")
+
+# Shown in the window until the Streamlit server is ready.
+LOADING_HTML = "<!DOCTYPE html><html><body></body></html>"
+
+# First Streamlit version that reads back the port it bound for server.port=0
+# and prints and reports that instead of 0.
+EPHEMERAL_PORT_STREAMLIT_VERSION = (1, 56)
 
 
 def find_free_port() -> int:
     """Find an available port on the system."""
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.bind(("", 0))
+        # SO_REUSEADDR only takes effect if it is set before binding
         s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        s.bind(("localhost", 0))
         return s.getsockname()[1]
 
 
-def run_streamlit(script_path: str, options: Dict[str, str]) -> None:
-    """Run the Streamlit app with specified options in a subprocess.
+def run_streamlit(
+    argv: Sequence[str], ready_fd: Optional[int] = None
+) -> subprocess.Popen:
+    """Run the Streamlit CLI with the given arguments in a subprocess.
 
     Args:
-        script_path: Path to the Streamlit script.
-        options: Dictionary of Streamlit options, including port and headless settings.
+        argv: Streamlit command line, e.g. ("streamlit", "run", "app.py").
+        ready_fd: Write end of a pipe on which the process reports its port
+            once the server is listening. Not supported on Windows.
+
+    Returns:
+        The Streamlit process, with its stdout available as a text pipe.
     """
-    args = ["streamlit", "run", script_path]
-    args.extend([f"--{key}={value}" for key, value in options.items()])
-    sys.argv = args
-    stcli.main()
+    if getattr(sys, "frozen", False):
+        # Frozen executables cannot run `-m`, so re-launch the executable itself
+        # and let freeze_support run the Streamlit CLI in the child.
+        command = [sys.executable, *argv[1:]]
+        env = {**os.environ, CHILD_PROCESS_ENV: "1"}
+    else:
+        # A lightweight entry point that runs the CLI and reports readiness
+        command = [sys.executable, "-m", "streamlit_desktop_app._child", *argv]
+        # The package may only be importable through the parent's sys.path
+        # (e.g. a vendored copy), which a fresh interpreter does not inherit.
+        package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        python_path = os.environ.get("PYTHONPATH")
+        env = {
+            **os.environ,
+            "PYTHONPATH": os.pathsep.join(filter(None, [package_root, python_path])),
+        }
+    if ready_fd is not None:
+        # Inherited through exec, which also keeps the posix_spawn path available
+        os.set_inheritable(ready_fd, True)
+        env[READY_FD_ENV] = str(ready_fd)
+    # Unbuffered output lets ServerWatcher see the server URL as soon as it is printed
+    env.update(PYTHONUNBUFFERED="1", PYTHONIOENCODING="utf-8")
+    return subprocess.Popen(
+        command,
+        env=env,
+        stdout=subprocess.PIPE,
+        encoding="utf-8",
+        errors="replace",
+        bufsize=1,
+        # Keeping close_fds off (and avoiding preexec_fn, start_new_session and
+        # pass_fds) lets CPython launch the child with posix_spawn instead of
+        # fork+exec. Python's own descriptors are non-inheritable anyway.
+        close_fds=False,
+    )
+
+
+def freeze_support() -> None:
+    """Run Streamlit if this is the Streamlit process of a frozen executable.
+
+    Frozen executables launch themselves again to run the Streamlit server.
+    Call this once at the start of the program, like
+    multiprocessing.freeze_support(); it does nothing in any other process.
+    """
+    if os.environ.pop(CHILD_PROCESS_ENV, None):
+        from streamlit_desktop_app._child import run_streamlit_cli
+
+        run_streamlit_cli(["streamlit", *sys.argv[1:]])
+        sys.exit()
+
+
+class ServerWatcher(threading.Thread):
+    """Forward the output of the Streamlit process and pick up its port.
+
+    Streamlit prints the URL it serves on once the server is listening, so the
+    port is published through the ``ready`` event as soon as that line appears.
+    This is the fallback when the process cannot report through ``ready_fd``.
+    """
+
+    def __init__(self, stream: IO[str], ready_fd: Optional[int] = None):
+        super().__init__(daemon=True)
+        self._stream = stream
+        self.ready_fd = ready_fd
+        self.port: Optional[int] = None
+        self.ready = threading.Event()
+
+    def run(self) -> None:
+        for line in self._stream:
+            if sys.stdout is not None:
+                try:
+                    sys.stdout.write(line)
+                except (OSError, ValueError, UnicodeError):
+                    # Keep draining the pipe even if the output cannot be shown,
+                    # or Streamlit blocks once the pipe buffer fills up.
+                    pass
+            if self.port is None:
+                match = SERVER_URL_PATTERN.search(line)
+                if match:
+                    self.port = int(match.group(1))
+                    self.ready.set()
+        # The process has exited, so stop anyone still waiting
+        self.ready.set()
 
 
-def wait_for_server(port: int, timeout: int = 10) -> None:
+def wait_for_server(
+    watcher: ServerWatcher,
+    timeout: int = 10,
+    clock: Callable[[], float] = time.monotonic,
+) -> int:
     """Wait for the Streamlit server to start.
 
     Args:
-        port: Port number where the server is expected to run.
+        watcher: Watcher attached to the output of the Streamlit process.
         timeout: Maximum time to wait for the server to start.
+        clock: Monotonic clock used to measure the timeout.
+
+    Returns:
+        Port number where the server is running.
     """
-    start_time = time.time()
-    url = f"http://localhost:{port}"
-    while True:
-        try:
-            requests.get(url)
-            break
-        except requests.ConnectionError:
-            if time.time() - start_time > timeout:
-                raise TimeoutError("Streamlit server did not start in time.")
-            time.sleep(0.1)
+    deadline = clock() + timeout
+    if watcher.ready_fd is not None:
+        port = read_ready_pipe(watcher.ready_fd, timeout, clock)
+        if port is not None:
+            return port
+
+    # Fall back to the URL printed by Streamlit
+    if not watcher.ready.wait(max(deadline - clock(), 0)):
+        raise TimeoutError("Streamlit server did not start in time.")
+    if watcher.port is None:
+        raise RuntimeError("Streamlit exited before the server started.")
+    return watcher.port
+
+
+def read_ready_pipe(
+    fd: int, timeout: float, clock: Callable[[], float] = time.monotonic
+) -> Optional[int]:
+    """Read the port reported by the Streamlit process through its ready pipe.
+
+    Args:
+        fd: Read end of the pipe.
+        timeout: Maximum time to wait for the port.
+        clock: Monotonic clock used to measure the timeout.
+
+    Returns:
+        The port, or None if the pipe was closed without reporting one.
+    """
+    deadline = clock() + timeout
+    data = b""
+    while not data.endswith(b"\n"):
+        remaining = deadline - clock()
+        if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+            raise TimeoutError("Streamlit server did not start in time.")
+        chunk = os.read(fd, 16)
+        if not chunk:
+            return None
+        data += chunk
+    return int(data)
+
+
+def supports_ephemeral_port() -> bool:
+    """Check whether Streamlit reports the port it binds for server.port=0."""
+    try:
+        version = importlib.metadata.version("streamlit")
+        major, minor = (int(part) for part in version.split(".")[:2])
+    except (importlib.metadata.PackageNotFoundError, ValueError):
+        return False
+    return (major, minor) >= EPHEMERAL_PORT_STREAMLIT_VERSION
 
 
 def start_desktop_app(
@@ -64,47 +235,101 @@ def start_desktop_app(
         title: Title of the desktop window.
         width: Width of the desktop window.
         height: Height of the desktop window.
-        options: Dictionary of additional Streamlit options.
+        options: Dictionary of additional Streamlit options. These take precedence
+            over DEFAULT_OPTIONS.
     """
-    if options is None:
-        options = {}
+    # Fallback for frozen entry points that do not call freeze_support() first
+    freeze_support()
+
+    import webview
+
+    options = {**DEFAULT_OPTIONS, **(options or {})}
 
     # Check for overridden options and print warnings
-    overridden_options = [
-        "server.address",
-        "server.port",
-        "server.headless",
-        "global.developmentMode",
-    ]
-    for opt in overridden_options:
-        if opt in options:
-            logging.warning(
-                f"Option '{opt}' is overridden by the application and will be ignored."
-            )
-
-    port = find_free_port()
+    for opt in sorted(options.keys() & OVERRIDDEN_OPTIONS):
+        logging.warning(
+            f"Option '{opt}' is overridden by the application and will be ignored."
+        )
+
+    # Let Streamlit pick a free port itself where it can report it back, which
+    # avoids racing other processes for a port found in advance.
+    port = 0 if supports_ephemeral_port() else find_free_port()
     options["server.address"] = "localhost"
     options["server.port"] = str(port)
     options["server.headless"] = "true"
     options["global.developmentMode"] = "false"
+    # The welcome message carries the server URL that ServerWatcher waits for,
+    # printed as localhost and the actual port only with these options unset
+    for opt in URL_OPTIONS:
+        options.pop(opt, None)
 
     # Launch Streamlit in a background process
-    multiprocessing.freeze_support()
-    streamlit_process = multiprocessing.Process(
-        target=run_streamlit, args=(script_path, options)
-    )
-    streamlit_process.start()
-
+    argv = ("streamlit", "run", script_path, *(f"--{k}={v}" for k, v in options.items()))
+    # The Streamlit process reports its port through a pipe as soon as it is
+    # listening. Windows cannot pass descriptors this way and relies on the
+    # server URL printed by Streamlit instead.
+    ready_fd = ready_w = None
+    if sys.platform != "win32":
+        ready_fd, ready_w = os.pipe()
+    # load_app takes over the read end when it runs, as it may still be
+    # reading from it after the window is closed and webview.start returns.
+    ready_fd_lock = threading.Lock()
+    ready_fd_taken = False
+    streamlit_process = None
     try:
-        # Wait for the Streamlit server to start
-        wait_for_server(port)
+        try:
+            streamlit_process = run_streamlit(argv, ready_fd=ready_w)
+        finally:
+            # Only the Streamlit process keeps the write end open, so the read
+            # end sees EOF as soon as it exits.
+            if ready_w is not None:
+                os.close(ready_w)
+        # run_streamlit always pipes stdout
+        assert streamlit_process.stdout is not None
+        watcher = ServerWatcher(streamlit_process.stdout, ready_fd)
+        watcher.start()
 
-        # Start pywebview with the Streamlit server URL
-        webview.create_window(
-            title, f"http://localhost:{port}", width=width, height=height
+        # Open the window right away and point it at Streamlit once the server
+        # is up, so the window does not wait for Streamlit to start.
+        window = webview.create_window(
+            title, html=LOADING_HTML, width=width, height=height
         )
-        webview.start()
+        errors = []
+
+        def load_app() -> None:
+            nonlocal ready_fd_taken
+            with ready_fd_lock:
+                if ready_fd_taken:
+                    # start_desktop_app has already cleaned up
+                    return
+                ready_fd_taken = True
+            try:
+                port = wait_for_server(watcher)
+            except Exception as e:
+                if not window.events.closed.is_set():
+                    errors.append(e)
+                    window.destroy()
+                return
+            finally:
+                if ready_fd is not None:
+                    os.close(ready_fd)
+            if not window.events.closed.is_set():
+                window.load_url(f"http://localhost:{port}")
+
+        webview.start(load_app)
+        if errors:
+            raise errors[0]
     finally:
+        with ready_fd_lock:
+            close_ready_fd = ready_fd is not None and not ready_fd_taken
+            ready_fd_taken = True
+        if close_ready_fd:
+            os.close(ready_fd)
         # Ensure the Streamlit process is terminated
-        streamlit_process.terminate()
-        streamlit_process.join()
+        if streamlit_process is not None:
+            streamlit_process.terminate()
+            try:
+                streamlit_process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                streamlit_process.kill()
+                streamlit_process.wait()
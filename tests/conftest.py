@@ -0,0 +1,20 @@
+import importlib
+
+import pytest
+
+# Modules the tests patch into; Streamlit and pywebview are slow to import
+WARM_MODULES = (
+    "streamlit_desktop_app.core",
+    "streamlit_desktop_app._child",
+    "streamlit_desktop_app.build",
+    "streamlit.web.cli",
+    "streamlit.web.bootstrap",
+    "webview",
+)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def warm_imports():
+    """Import heavy modules once so the first test does not pay for them."""
+    for name in WARM_MODULES:
+        importlib.import_module(name)
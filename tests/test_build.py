@@ -1,95 +1,89 @@
-import unittest
-from unittest.mock import patch, mock_open, MagicMock
-import os
-import tempfile
-import shutil
+import pytest
+from unittest.mock import patch
 from streamlit_desktop_app.build import (
     extract_imports,
     parse_streamlit_options,
     build_executable,
 )
 
+EXPECTED_IMPORTS = frozenset({"os", "sys", "streamlit.web", "streamlit.web.cli", "pandas"})
 
-class TestBuildScript(unittest.TestCase):
-    def setUp(self):
-        # Create a temporary directory for test scripts
-        self.temp_dir = tempfile.mkdtemp()
-        self.script_path = os.path.join(self.temp_dir, "test_script.py")
-        with open(self.script_path, "w") as f:
-            f.write(
-                "import os\n"
-                "import sys\n"
-                "from streamlit import web\n"
-                "from streamlit.web import cli\n"
-                "import pandas as pd\n"
-            )
 
-        # Create a dummy icon file
-        self.icon_path = os.path.join(self.temp_dir, "icon.ico")
-        with open(self.icon_path, "w") as f:
-            f.write("")
+@pytest.fixture(scope="session")
+def script_env(tmp_path_factory):
+    """Write the test script and a dummy icon once for the whole session."""
+    temp_dir = tmp_path_factory.mktemp("build")
+    script_path = temp_dir / "test_script.py"
+    script_path.write_text(
+        "import os\n"
+        "import sys\n"
+        "from streamlit import web\n"
+        "from streamlit.web import cli\n"
+        "import pandas as pd\n"
+    )
 
-    def tearDown(self):
-        # Clean up temporary directory
-        shutil.rmtree(self.temp_dir)
+    # Create a dummy icon file
+    icon_path = temp_dir / "icon.ico"
+    icon_path.write_text("")
 
-    def test_extract_imports(self):
-        # Test extracting imports from a script
-        imports = extract_imports(self.script_path)
-        self.assertSetEqual(set(imports), {"os", "sys", "streamlit.web", "streamlit.web.cli", "pandas"})
+    return str(script_path), str(icon_path)
 
-    def test_parse_streamlit_options_from_list(self):
-        # Test parsing Streamlit options from a list
-        options = parse_streamlit_options(
-            ["--theme.base=dark", "--server.headless", "false"]
-        )
-        self.assertEqual(options, {"theme.base": "dark", "server.headless": "false"})
 
-    def test_parse_streamlit_options_from_dict(self):
-        # Test parsing Streamlit options from a dictionary
-        options = parse_streamlit_options({"theme.base": "dark", "server.headless": "false"})
-        self.assertEqual(options, {"theme.base": "dark", "server.headless": "false"})
+def test_extract_imports(script_env):
+    # Test extracting imports from a script
+    script_path, _ = script_env
+    imports = extract_imports(script_path)
+    assert frozenset(imports) == EXPECTED_IMPORTS
 
-    def test_parse_streamlit_options_empty(self):
-        # Test parsing empty options
-        self.assertIsNone(parse_streamlit_options(None))
-        self.assertIsNone(parse_streamlit_options([]))
 
-    @patch("streamlit_desktop_app.build.PyInstaller.__main__.run")
-    @patch("streamlit_desktop_app.build.extract_imports", return_value=["os", "sys", "streamlit", "pandas"])
-    def test_build_executable(self, mock_extract_imports, mock_pyinstaller_run):
-        # Test building an executable with a raw script
-        build_executable(
-            script_path=self.script_path,
-            name="TestApp",
-            icon=self.icon_path,
-            pyinstaller_options=["--onefile"],
-            streamlit_options=["--theme.base=dark"],
-        )
+@pytest.mark.parametrize(
+    "streamlit_options, expected",
+    [
+        # Options given as CLI arguments, with and without "="
+        (["--theme.base=dark", "--server.headless", "false"], {"theme.base": "dark", "server.headless": "false"}),
+        # Options given as a dictionary
+        ({"theme.base": "dark", "server.headless": "false"}, {"theme.base": "dark", "server.headless": "false"}),
+        # No options
+        (None, None),
+        ([], None),
+    ],
+)
+def test_parse_streamlit_options(streamlit_options, expected):
+    assert parse_streamlit_options(streamlit_options) == expected
 
-        # Ensure PyInstaller's run method is called with the correct arguments
-        mock_pyinstaller_run.assert_called_once()
-        args = mock_pyinstaller_run.call_args[0][0]
-        self.assertIn("--onefile", args)
-        self.assertIn("--name", args)
-        self.assertIn("TestApp", args)
-        self.assertIn("--add-data", args)
-        self.assertIn(f"{self.script_path}:.", args)
 
+@patch("streamlit_desktop_app.build.PyInstaller.__main__.run")
+@patch("streamlit_desktop_app.build.extract_imports", return_value=["os", "sys", "streamlit", "pandas"])
+def test_build_executable(mock_extract_imports, mock_pyinstaller_run, script_env):
+    # Test building an executable with a raw script
+    script_path, icon_path = script_env
+    build_executable(
+        script_path=script_path,
+        name="TestApp",
+        icon=icon_path,
+        pyinstaller_options=["--onefile"],
+        streamlit_options=["--theme.base=dark"],
+    )
 
-    @patch("streamlit_desktop_app.build.os.path.exists", return_value=False)
-    def test_missing_script(self, mock_exists):
-        # Test behavior when the script file is missing
-        with self.assertRaises(SystemExit) as cm:
-            build_executable(
-                script_path="missing_script.py",
-                name="TestApp",
-                icon=None,
-                pyinstaller_options=None,
-                streamlit_options=None,
-            )
-        self.assertEqual(str(cm.exception), "Error: The script 'missing_script.py' does not exist.")
+    # Ensure PyInstaller's run method is called with the correct arguments
+    mock_pyinstaller_run.assert_called_once()
+    args = mock_pyinstaller_run.call_args[0][0]
+    assert "--onefile" in args
+    assert "--name" in args
+    assert "TestApp" in args
+    assert "--add-data" in args
+    assert f"{script_path}:." in args
 
 
-if __name__ == "__main__":
-    unittest.main()
+def test_missing_script(monkeypatch):
+    # Test behavior when the script file is missing
+    monkeypatch.setattr("streamlit_desktop_app.build.os.path.exists", lambda path: False)
+    with pytest.raises(SystemExit) as excinfo:
+        build_executable(
+            script_path="missing_script.py",
+            name="TestApp",
+            icon=None,
+            pyinstaller_options=None,
+            streamlit_options=None,
+        )
+    assert str(excinfo.value) == "Error: The script 'missing_script.py' does not exist."
@@ -0,0 +1,50 @@
+import os
+import sys
+import pytest
+from unittest.mock import patch, MagicMock
+from streamlit.web import bootstrap
+from streamlit_desktop_app._child import (
+    READY_FD_ENV,
+    notify_when_ready,
+    run_streamlit_cli,
+)
+
+
+@patch("streamlit.web.cli.main")  # Mock Streamlit CLI entry point
+def test_run_streamlit_cli(mock_stcli_main):
+    argv = ("streamlit", "run", "test_script.py", "--theme.base=dark")
+
+    with patch.object(sys, "argv", []):
+        run_streamlit_cli(argv)
+        assert sys.argv == list(argv)
+
+    mock_stcli_main.assert_called_once()
+
+
+@patch("streamlit_desktop_app._child.notify_when_ready")
+@patch("streamlit.web.cli.main")
+def test_run_streamlit_cli_ready_fd(mock_stcli_main, mock_notify_when_ready):
+    with patch.dict(os.environ, {READY_FD_ENV: "42"}), patch.object(sys, "argv", []):
+        run_streamlit_cli(("streamlit", "run", "test_script.py"))
+        assert READY_FD_ENV not in os.environ
+
+    # The inherited pipe is hooked up before Streamlit starts
+    mock_notify_when_ready.assert_called_once_with(42)
+    mock_stcli_main.assert_called_once()
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Ready pipes are not used on Windows")
+@patch("streamlit.config.get_option", return_value=12345)
+@patch("streamlit.web.bootstrap._on_server_start")
+def test_notify_when_ready(mock_on_server_start, mock_get_option):
+    read_fd, write_fd = os.pipe()
+    try:
+        notify_when_ready(write_fd)
+
+        # The port is written once Streamlit's own start-up hook has run
+        server = MagicMock()
+        bootstrap._on_server_start(server)
+        mock_on_server_start.assert_called_once_with(server)
+        assert os.read(read_fd, 16) == b"12345\n"
+    finally:
+        os.close(read_fd)
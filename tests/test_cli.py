@@ -1,6 +1,12 @@
 import pytest
 from unittest.mock import patch
-from streamlit_desktop_app.cli import main
+from streamlit_desktop_app.cli import _build_parser, _dispatch, main
+
+
+@pytest.fixture(scope="module")
+def parser():
+    """Build the CLI parser once for all tests in this module."""
+    return _build_parser()
 
 
 @pytest.fixture
@@ -38,11 +44,18 @@ def mock_build_executable():
         ),
     ],
 )
-def test_build_command(mock_build_executable, args, expected_call):
+def test_build_command(parser, mock_build_executable, args, expected_call):
     """Test the 'build' subcommand with various argument combinations."""
+    _dispatch(parser.parse_args(args[1:]))
+    mock_build_executable.assert_called_once_with(**expected_call)
+
+
+def test_main(mock_build_executable):
+    """Test that main parses sys.argv and runs the subcommand."""
+    args = ["streamlit-desktop-app", "build", "tests/example.py", "--name", "MyApp"]
     with patch("sys.argv", args):
         main()
-    mock_build_executable.assert_called_once_with(**expected_call)
+    mock_build_executable.assert_called_once()
 
 
 def test_missing_required_arguments():
@@ -54,10 +67,9 @@ def test_missing_required_arguments():
         assert excinfo.value.code == 2  # argparse exits with code 2 for missing arguments
 
 
-def test_invalid_command():
+def test_invalid_command(parser):
     """Test an invalid command for the CLI."""
     args = ["streamlit-desktop-app", "invalid_command"]
-    with patch("sys.argv", args):
-        with pytest.raises(SystemExit) as excinfo:
-            main()
-        assert excinfo.value.code == 2  # argparse exits with code 2 for invalid commands
+    with pytest.raises(SystemExit) as excinfo:
+        parser.parse_args(args[1:])
+    assert excinfo.value.code == 2  # argparse exits with code 2 for invalid commands
@@ -1,129 +1,521 @@
+import contextlib
+import functools
+import io
+import logging
 import os
-import requests
 import socket
+import subprocess
 import sys
-import unittest
-from unittest.mock import patch, MagicMock, call
+import threading
+import types
+import pytest
+from unittest.mock import patch, MagicMock, ANY, create_autospec
+import streamlit_desktop_app
 from streamlit_desktop_app.core import (
+    CHILD_PROCESS_ENV,
+    LOADING_HTML,
+    READY_FD_ENV,
+    ServerWatcher,
     find_free_port,
+    freeze_support,
+    read_ready_pipe,
     run_streamlit,
+    supports_ephemeral_port,
     wait_for_server,
     start_desktop_app,
 )
 
+STREAMLIT_ARGV = ("streamlit", "run", "test_script.py", "--theme.base=dark", "--server.headless=true")
+EXPECTED_COMMAND = [sys.executable, "-m", "streamlit_desktop_app._child", *STREAMLIT_ARGV]
+EXPECTED_FROZEN_COMMAND = [sys.executable, *STREAMLIT_ARGV[1:]]
 
-class TestCore(unittest.TestCase):
-    @patch("socket.socket")
-    def test_find_free_port(self, mock_socket):
-        # Mock socket behavior
-        mock_socket_instance = MagicMock()
-        mock_socket.return_value.__enter__.return_value = mock_socket_instance
-        mock_socket_instance.getsockname.return_value = ("127.0.0.1", 12345)
+skip_on_windows = pytest.mark.skipif(sys.platform == "win32", reason="Ready pipes are not used on Windows")
 
-        # Use the actual constants from the socket module
-        SOL_SOCKET = socket.SOL_SOCKET
-        SO_REUSEADDR = socket.SO_REUSEADDR
 
-        port = find_free_port()
-        self.assertEqual(port, 12345)
-        mock_socket_instance.bind.assert_called_once()
-        mock_socket_instance.setsockopt.assert_called_once_with(SOL_SOCKET, SO_REUSEADDR, 1)
+@pytest.fixture
+def pipe():
+    """Create a pipe, closing whichever ends the test leaves open."""
+    read_fd, write_fd = os.pipe()
+    yield read_fd, write_fd
+    for fd in (read_fd, write_fd):
+        with contextlib.suppress(OSError):
+            os.close(fd)
 
 
-    @patch("streamlit.web.cli.main")  # Mock Streamlit CLI entry point
-    def test_run_streamlit(self, mock_stcli_main):
-        script_path = "test_script.py"
-        options = {"theme.base": "dark", "server.headless": "true"}
+@pytest.fixture(scope="session")
+def webview_template():
+    """Build an autospec'd mock of the pywebview API once per session."""
+    import webview
 
-        # Expected arguments
-        expected_argv = [
-            "streamlit",
-            "run",
-            script_path,
-            "--theme.base=dark",
+    # Only the functions the app calls are specced; the module's lazy
+    # attributes (e.g. screens) would initialize a GUI backend.
+    template = create_autospec(
+        types.SimpleNamespace(create_window=webview.create_window, start=webview.start)
+    )
+    window = create_autospec(webview.Window, instance=True)
+    # Window events are created per instance, so they are not in the spec
+    window.events = MagicMock()
+    window.events.closed = create_autospec(webview.event.Event, instance=True)
+    template.create_window.return_value = window
+    return template
+
+
+@pytest.fixture
+def mock_webview(webview_template):
+    """Provide the shared pywebview mock, reset and installed as the webview module."""
+    webview_template.reset_mock(side_effect=True)
+    webview_template.create_window.return_value.events.closed.is_set.return_value = False
+    with patch.dict(sys.modules, {"webview": webview_template}):
+        yield webview_template
+
+
+@pytest.fixture
+def socket_mock(monkeypatch):
+    """Replace socket.socket and return the socket used inside the with block."""
+    mock_socket = MagicMock()
+    mock_socket_instance = mock_socket.return_value.__enter__.return_value
+    mock_socket_instance.getsockname.return_value = ("127.0.0.1", 12345)
+    monkeypatch.setattr("socket.socket", mock_socket)
+    return mock_socket_instance
+
+
+def test_find_free_port(socket_mock):
+    port = find_free_port()
+    assert port == 12345
+    socket_mock.bind.assert_called_once_with(("localhost", 0))
+    socket_mock.setsockopt.assert_called_once_with(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    # The option must be set before binding to have any effect
+    assert [name for name, _, _ in socket_mock.mock_calls[:2]] == ["setsockopt", "bind"]
+
+
+def test_find_free_port_bind_error(socket_mock):
+    socket_mock.bind.side_effect = OSError
+
+    # Failures to bind are not swallowed
+    with pytest.raises(OSError):
+        find_free_port()
+
+
+@patch("streamlit_desktop_app.core.subprocess.Popen")
+def test_run_streamlit(mock_popen):
+    process = run_streamlit(STREAMLIT_ARGV)
+
+    # Streamlit runs in a fresh interpreter through the lightweight child module
+    assert process is mock_popen.return_value
+    mock_popen.assert_called_once_with(
+        EXPECTED_COMMAND,
+        env=ANY,
+        stdout=subprocess.PIPE,
+        encoding="utf-8",
+        errors="replace",
+        bufsize=1,
+        close_fds=False,
+    )
+    # Output must be unbuffered for the server URL to be seen promptly
+    assert mock_popen.call_args[1]["env"]["PYTHONUNBUFFERED"] == "1"
+
+
+@pytest.mark.parametrize("python_path", [[], ["/opt/lib", "/srv/lib"]])
+@patch("streamlit_desktop_app.core.subprocess.Popen")
+def test_run_streamlit_python_path(mock_popen, monkeypatch, python_path):
+    if python_path:
+        monkeypatch.setenv("PYTHONPATH", os.pathsep.join(python_path))
+    else:
+        monkeypatch.delenv("PYTHONPATH", raising=False)
+
+    run_streamlit(STREAMLIT_ARGV)
+
+    # The child can import this package however the parent found it, and
+    # any PYTHONPATH already set still applies
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(streamlit_desktop_app.__file__)))
+    env = mock_popen.call_args[1]["env"]
+    assert env["PYTHONPATH"].split(os.pathsep) == [package_root, *python_path]
+
+
+@patch("streamlit_desktop_app.core.subprocess.Popen")
+def test_run_streamlit_frozen(mock_popen):
+    with patch.object(sys, "frozen", True, create=True):
+        run_streamlit(STREAMLIT_ARGV)
+
+    # Frozen executables re-launch themselves in child mode
+    command = mock_popen.call_args[0][0]
+    env = mock_popen.call_args[1]["env"]
+    assert command == EXPECTED_FROZEN_COMMAND
+    assert env[CHILD_PROCESS_ENV] == "1"
+
+
+@skip_on_windows
+@patch("streamlit_desktop_app.core.subprocess.Popen")
+def test_run_streamlit_ready_fd(mock_popen, pipe):
+    read_fd, write_fd = pipe
+
+    run_streamlit(STREAMLIT_ARGV, ready_fd=write_fd)
+
+    # The child finds the inherited pipe through the environment
+    env = mock_popen.call_args[1]["env"]
+    assert env[READY_FD_ENV] == str(write_fd)
+    assert os.get_inheritable(write_fd)
+
+
+@skip_on_windows
+def test_read_ready_pipe(pipe):
+    read_fd, write_fd = pipe
+    os.write(write_fd, b"123")
+    os.write(write_fd, b"45\n")
+    os.close(write_fd)
+
+    assert read_ready_pipe(read_fd, timeout=1) == 12345
+
+
+@skip_on_windows
+def test_read_ready_pipe_closed(pipe):
+    read_fd, write_fd = pipe
+    os.close(write_fd)
+
+    # The process exited (or could not hook into Streamlit) without reporting
+    assert read_ready_pipe(read_fd, timeout=1) is None
+
+
+@skip_on_windows
+def test_read_ready_pipe_timeout(pipe):
+    read_fd, write_fd = pipe
+    clock = iter([0.0, 999.0]).__next__
+
+    # The second clock reading is already past the deadline, so nothing waits
+    with pytest.raises(TimeoutError):
+        read_ready_pipe(read_fd, timeout=10, clock=clock)
+
+
+@skip_on_windows
+def test_wait_for_server_ready_fd(pipe):
+    read_fd, write_fd = pipe
+    os.write(write_fd, b"12345\n")
+    os.close(write_fd)
+
+    watcher = ServerWatcher(io.StringIO(), read_fd)
+    assert wait_for_server(watcher) == 12345
+
+
+@patch("sys.stdout", new_callable=io.StringIO)
+def test_server_watcher(mock_stdout):
+    output = (
+        "\n"
+        "  You can now view your Streamlit app in your browser.\n"
+        "\n"
+        "  URL: http://localhost:12345\n"
+    )
+    watcher = ServerWatcher(io.StringIO(output))
+    watcher.run()
+
+    # The port is picked up and the output is forwarded unchanged
+    assert watcher.ready.is_set()
+    assert watcher.port == 12345
+    assert mock_stdout.getvalue() == output
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        UnicodeEncodeError("cp1252", "\U0001f388", 0, 1, "character maps to <undefined>"),
+        BrokenPipeError(),
+        ValueError("I/O operation on closed file."),
+    ],
+)
+def test_server_watcher_output_error(error):
+    stream = io.StringIO("Balloons \U0001f388\n" * 100 + "  URL: http://localhost:12345\n" + "more\n" * 100)
+    watcher = ServerWatcher(stream)
+    with patch("sys.stdout") as mock_stdout:
+        mock_stdout.write.side_effect = error
+        watcher.run()
+
+    # Output that cannot be forwarded does not stop the pipe being drained
+    assert watcher.port == 12345
+    assert watcher.ready.is_set()
+    assert stream.read() == ""
+    assert mock_stdout.write.call_count == 201
+
+
+@patch("sys.stdout", new_callable=io.StringIO)
+def test_server_watcher_process_exited(mock_stdout):
+    watcher = ServerWatcher(io.StringIO("Error: Invalid value\n"))
+    watcher.run()
+
+    # Waiters are released even though no URL was printed
+    assert watcher.ready.is_set()
+    assert watcher.port is None
+
+
+@pytest.mark.parametrize(
+    "port, ready, expected_error",
+    [
+        (12345, True, None),  # The server reported its port
+        (None, False, TimeoutError),  # The server never started in time
+        (None, True, RuntimeError),  # The process exited without a URL
+    ],
+)
+def test_wait_for_server(port, ready, expected_error):
+    watcher = ServerWatcher(io.StringIO())
+    watcher.port = port
+    if ready:
+        watcher.ready.set()
+    clock = iter([0.0, 999.0]).__next__
+
+    # The second clock reading is already past the deadline, so nothing waits
+    if expected_error is None:
+        assert wait_for_server(watcher, clock=clock) == port
+    else:
+        with pytest.raises(expected_error):
+            wait_for_server(watcher, clock=clock)
+
+
+@pytest.mark.parametrize(
+    "version, expected",
+    [
+        ("1.13.0", False),
+        ("1.55.1", False),
+        ("1.56.0", True),
+        ("1.57.2", True),
+        ("2.0.0", True),
+        ("unknown", False),
+    ],
+)
+@patch("streamlit_desktop_app.core.importlib.metadata.version")
+def test_supports_ephemeral_port(mock_version, version, expected):
+    mock_version.return_value = version
+    assert supports_ephemeral_port() == expected
+
+
+@pytest.fixture
+def ready_pipes(monkeypatch):
+    """Record the pipes created through os.pipe."""
+    pipes = []
+    real_pipe = os.pipe
+
+    def record_pipe():
+        fds = real_pipe()
+        pipes.append(fds)
+        return fds
+
+    monkeypatch.setattr(os, "pipe", record_pipe)
+    return pipes
+
+
+def is_open(fd):
+    try:
+        os.fstat(fd)
+    except OSError:
+        return False
+    return True
+
+
+@pytest.fixture
+def app_mocks(monkeypatch, mock_webview):
+    """Replace everything start_desktop_app starts or waits on with mocks."""
+    mocks = types.SimpleNamespace(
+        find_free_port=MagicMock(return_value=12345),
+        supports_ephemeral_port=MagicMock(return_value=True),
+        run_streamlit=MagicMock(),
+        server_watcher=MagicMock(),
+        wait_for_server=MagicMock(return_value=12345),
+        webview=mock_webview,
+    )
+    monkeypatch.setattr("streamlit_desktop_app.core.find_free_port", mocks.find_free_port)
+    monkeypatch.setattr("streamlit_desktop_app.core.supports_ephemeral_port", mocks.supports_ephemeral_port)
+    monkeypatch.setattr("streamlit_desktop_app.core.run_streamlit", mocks.run_streamlit)
+    monkeypatch.setattr("streamlit_desktop_app.core.ServerWatcher", mocks.server_watcher)
+    monkeypatch.setattr("streamlit_desktop_app.core.wait_for_server", mocks.wait_for_server)
+    # Run the window's start-up callback as the GUI loop would
+    mock_webview.start.side_effect = lambda func: func()
+    return mocks
+
+
+def test_start_desktop_app(app_mocks):
+    script_path = os.path.join(os.path.dirname(__file__), "test_script.py")
+    title = "Test App"
+    options = {"theme.base": "dark"}
+
+    start_desktop_app(
+        script_path=script_path,
+        title=title,
+        width=800,
+        height=600,
+        options=options,
+    )
+
+    # Assertions for process and server behavior
+    # Streamlit picks the port itself and reports it back
+    app_mocks.find_free_port.assert_not_called()
+    argv = app_mocks.run_streamlit.call_args[0][0]
+    assert argv[:3] == ("streamlit", "run", script_path)
+    assert sorted(argv[3:]) == sorted(
+        [
+            "--server.address=localhost",
+            "--server.port=0",
             "--server.headless=true",
-        ]
-
-        # Patch sys.argv explicitly for this test
-        with patch.object(sys, "argv", expected_argv):
-            run_streamlit(script_path, options)
-            # Validate sys.argv is correctly set during the function
-            self.assertEqual(sys.argv, expected_argv)
-
-        # Validate the CLI was called
-        mock_stcli_main.assert_called_once()
-
-
-    @patch("time.sleep")
-    @patch("streamlit_desktop_app.core.requests.get")
-    def test_wait_for_server_success(self, mock_requests_get, mock_sleep):
-        # Simulate successful server start
-        mock_requests_get.return_value.status_code = 200
-
-        try:
-            wait_for_server(12345)
-        except TimeoutError:
-            self.fail("wait_for_server raised TimeoutError unexpectedly!")
-        mock_requests_get.assert_called_with("http://localhost:12345")
-
-    @patch("time.sleep")
-    @patch("streamlit_desktop_app.core.requests.get")
-    def test_wait_for_server_timeout(self, mock_requests_get, mock_sleep):
-        # Simulate server failing to start
-        mock_requests_get.side_effect = requests.ConnectionError
-
-        with self.assertRaises(TimeoutError):
-            wait_for_server(12345, timeout=1)  # Short timeout for testing
-        self.assertGreaterEqual(mock_sleep.call_count, 1)
-
-    @patch("streamlit_desktop_app.core.webview")
-    @patch("streamlit_desktop_app.core.wait_for_server")
-    @patch("streamlit_desktop_app.core.multiprocessing.Process")
-    @patch("streamlit_desktop_app.core.find_free_port", return_value=12345)
-    def test_start_desktop_app(
-        self, mock_find_free_port, mock_process, mock_wait_for_server, mock_webview
-    ):
-        # Mock subprocess and webview behavior
-        mock_process_instance = MagicMock()
-        mock_process.return_value = mock_process_instance
-
-        script_path = os.path.join(os.path.dirname(__file__), "test_script.py")
-        title = "Test App"
-        options = {"theme.base": "dark"}
-
-        start_desktop_app(
-            script_path=script_path,
-            title=title,
-            width=800,
-            height=600,
-            options=options,
-        )
-
-        # Assertions for process and server behavior
-        mock_find_free_port.assert_called_once()
-        mock_process.assert_called_once_with(
-            target=run_streamlit,
-            args=(script_path, {
-                "server.address": "localhost",
-                "server.port": "12345",
-                "server.headless": "true",
-                "global.developmentMode": "false",
-                "theme.base": "dark",
-            }),
-        )
-        mock_process_instance.start.assert_called_once()
-        mock_wait_for_server.assert_called_once_with(12345)
-
-        # Assertions for webview behavior
-        mock_webview.create_window.assert_called_once_with(
-            title, "http://localhost:12345", width=800, height=600
-        )
-        mock_webview.start.assert_called_once()
-
-        # Ensure the process is terminated
-        mock_process_instance.terminate.assert_called_once()
-        mock_process_instance.join.assert_called_once()
-
-
-if __name__ == "__main__":
-    unittest.main()
+            "--global.developmentMode=false",
+            "--server.fileWatcherType=none",
+            "--server.runOnSave=false",
+            "--browser.gatherUsageStats=false",
+            "--theme.base=dark",
+        ],
+    )
+    assert app_mocks.run_streamlit.call_args[1].keys() == {"ready_fd"}
+    mock_process = app_mocks.run_streamlit.return_value
+    app_mocks.server_watcher.assert_called_once_with(mock_process.stdout, ANY)
+    app_mocks.server_watcher.return_value.start.assert_called_once()
+
+    # The window opens before the server is ready, then loads the app
+    app_mocks.webview.create_window.assert_called_once_with(
+        title, html=LOADING_HTML, width=800, height=600
+    )
+    app_mocks.webview.start.assert_called_once()
+    app_mocks.wait_for_server.assert_called_once_with(app_mocks.server_watcher.return_value)
+    mock_window = app_mocks.webview.create_window.return_value
+    mock_window.load_url.assert_called_once_with("http://localhost:12345")
+
+    # Ensure the process is terminated
+    mock_process.terminate.assert_called_once()
+    mock_process.wait.assert_called_once_with(timeout=5)
+
+
+def test_start_desktop_app_fixed_port(app_mocks, caplog):
+    app_mocks.supports_ephemeral_port.return_value = False
+
+    with caplog.at_level(logging.WARNING):
+        start_desktop_app("test_script.py", options={"server.port": "8501"})
+
+    # User values for options controlled by the app are ignored with a warning
+    assert len(caplog.records) == 1
+    assert "server.port" in caplog.records[0].getMessage()
+
+    # Older Streamlit versions are given a port found in advance
+    app_mocks.find_free_port.assert_called_once()
+    assert "--server.port=12345" in app_mocks.run_streamlit.call_args[0][0]
+
+
+def test_start_desktop_app_stdout_only(app_mocks, monkeypatch, caplog):
+    # Windows has no ready pipe and relies on the URL printed by Streamlit
+    monkeypatch.setattr(sys, "platform", "win32")
+    options = {
+        "browser.serverAddress": "myhost.local",
+        "browser.serverPort": "80",
+        "logger.hideWelcomeMessage": "true",
+    }
+
+    with caplog.at_level(logging.WARNING):
+        start_desktop_app("test_script.py", options=options)
+
+    # Options that would change or hide the printed URL are dropped with a warning
+    assert sorted(opt for opt in options if opt in caplog.text) == sorted(options)
+    argv = app_mocks.run_streamlit.call_args[0][0]
+    assert not [arg for arg in argv if arg.startswith(("--browser.server", "--logger."))]
+    assert app_mocks.run_streamlit.call_args[1] == {"ready_fd": None}
+    app_mocks.server_watcher.assert_called_once_with(app_mocks.run_streamlit.return_value.stdout, None)
+    app_mocks.webview.create_window.return_value.load_url.assert_called_once_with("http://localhost:12345")
+
+
+@pytest.mark.parametrize(
+    "where, error, terminated, destroyed",
+    [
+        ("run_streamlit", OSError, False, False),
+        ("webview.create_window", Exception, True, False),
+        ("webview.start", Exception, True, False),
+        ("wait_for_server", TimeoutError, True, True),
+        ("wait_for_server", RuntimeError, True, True),
+    ],
+)
+def test_start_desktop_app_error(app_mocks, where, error, terminated, destroyed):
+    functools.reduce(getattr, where.split("."), app_mocks).side_effect = error
+
+    with pytest.raises(error):
+        start_desktop_app("test_script.py")
+
+    # A started Streamlit process is always cleaned up, and a window that
+    # cannot show the app is closed instead of being left on the loading page
+    mock_window = app_mocks.webview.create_window.return_value
+    mock_window.load_url.assert_not_called()
+    assert mock_window.destroy.called == destroyed
+    assert app_mocks.run_streamlit.return_value.terminate.called == terminated
+
+
+@skip_on_windows
+def test_start_desktop_app_window_closed_before_load(app_mocks, ready_pipes):
+    # The window is closed before pywebview runs load_app
+    app_mocks.webview.start.side_effect = None
+
+    start_desktop_app("test_script.py")
+
+    # Nobody else will read the pipe, so start_desktop_app closes it
+    ((read_fd, _),) = ready_pipes
+    assert not is_open(read_fd)
+
+    # A late load_app leaves the cleaned-up pipe alone
+    load_app = app_mocks.webview.start.call_args[0][0]
+    load_app()
+    app_mocks.wait_for_server.assert_not_called()
+
+
+@skip_on_windows
+def test_start_desktop_app_window_closed_while_waiting(app_mocks, ready_pipes):
+    release = threading.Event()
+
+    def wait_for_server(watcher):
+        release.wait(5)
+        # The terminated Streamlit process never reported its port
+        raise RuntimeError
+
+    app_mocks.wait_for_server.side_effect = wait_for_server
+    mock_window = app_mocks.webview.create_window.return_value
+    threads = []
+
+    def start(func):
+        # The user closes the window while load_app is still waiting
+        mock_window.events.closed.is_set.return_value = True
+        thread = threading.Thread(target=func)
+        thread.start()
+        threads.append(thread)
+
+    app_mocks.webview.start.side_effect = start
+
+    start_desktop_app("test_script.py")
+
+    # load_app still owns the read end, so it is left open for it
+    ((read_fd, _),) = ready_pipes
+    assert is_open(read_fd)
+
+    release.set()
+    threads[0].join(5)
+    assert not is_open(read_fd)
+
+    # The window is already gone, so nothing is done with it
+    mock_window.destroy.assert_not_called()
+    mock_window.load_url.assert_not_called()
+
+
+@patch("streamlit_desktop_app._child.run_streamlit_cli")
+def test_start_desktop_app_child_process(mock_run_streamlit_cli, mock_webview):
+    argv = ["app", "run", "test_script.py", "--server.port=12345"]
+    with patch.dict(os.environ, {CHILD_PROCESS_ENV: "1"}), patch.object(sys, "argv", argv):
+        with pytest.raises(SystemExit):
+            start_desktop_app("test_script.py")
+        assert CHILD_PROCESS_ENV not in os.environ
+
+    # The child runs Streamlit directly instead of opening a window
+    mock_run_streamlit_cli.assert_called_once_with(["streamlit", *argv[1:]])
+    mock_webview.create_window.assert_not_called()
+
+
+@patch("streamlit_desktop_app._child.run_streamlit_cli")
+def test_freeze_support(mock_run_streamlit_cli):
+    # Outside a frozen executable's Streamlit process this does nothing
+    with patch.dict(os.environ, clear=False):
+        os.environ.pop(CHILD_PROCESS_ENV, None)
+        freeze_support()
+    mock_run_streamlit_cli.assert_not_called()
+
+    argv = ["app", "run", "test_script.py"]
+    with patch.dict(os.environ, {CHILD_PROCESS_ENV: "1"}), patch.object(sys, "argv", argv):
+        with pytest.raises(SystemExit):
+            freeze_support()
+    mock_run_streamlit_cli.assert_called_once_with(["streamlit", "run", "test_script.py"])
+